@@ -1,7 +1,10 @@
 """titiler.stacapi tests configuration."""
 
 import os
+import pathlib
+from typing import Dict
 
+import orjson
 import pytest
 import rasterio
 from fastapi.testclient import TestClient
@@ -9,6 +12,18 @@ from fastapi.testclient import TestClient
 DATA_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
 
 
+@pytest.fixture(scope="session")
+def item_json() -> Dict:
+    """STAC Item (COG asset) fixture.
+
+    The same dict is shared across tests, copy it before mutating it.
+
+    """
+    return orjson.loads(
+        pathlib.Path(DATA_DIR, "20200307aC0853900w361030.json").read_bytes()
+    )
+
+
 @pytest.fixture
 def app(monkeypatch):
     """App fixture."""
@@ -1,39 +1,76 @@
 """Test titiler.stacapi.stac_reader functions."""
 
-import json
-import os
+from concurrent import futures
 from unittest.mock import patch
 
+import morecantile
 import pytest
+import rasterio
+from rio_tiler.errors import AssetAsBandError, InvalidAssetName, InvalidExpression
 from rio_tiler.io import Reader
 from rio_tiler.models import ImageData
 
-from titiler.stacapi.assets_reader import AssetsReader
+from titiler.stacapi.assets_reader import AssetsReader, _dataset_statistics
 from titiler.stacapi.models import AssetInfo
 
 from .conftest import mock_rasterio_open
 
-item_file = os.path.join(
-    os.path.dirname(__file__), "fixtures", "20200307aC0853900w361030.json"
-)
-item_json = json.loads(open(item_file).read())
-
 
-def test_get_asset_info():
+def test_get_asset_info(item_json):
     """Test get_asset_info function"""
     assets_reader = AssetsReader(item_json)
     expected_asset_info = AssetInfo(
         url=item_json["assets"]["cog"]["href"],
         type=item_json["assets"]["cog"]["type"],
-        env={},
+        env={
+            "GDAL_DISABLE_READDIR_ON_OPEN": "EMPTY_DIR",
+            "GDAL_INGESTED_BYTES_AT_OPEN": 32768,
+            "GDAL_HTTP_MERGE_CONSECUTIVE_RANGES": "YES",
+            "VSI_CACHE": "TRUE",
+        },
     )
     assert assets_reader._get_asset_info("cog") == expected_asset_info
+    # asset info is computed once per reader
+    assert assets_reader._get_asset_info("cog") is assets_reader._get_asset_info("cog")
+
+    # `file:header_size` takes precedence over the default
+    item = {
+        **item_json,
+        "assets": {
+            "cog": {**item_json["assets"]["cog"], "file:header_size": 16384},
+            "data": {"href": "https://file.nc", "type": "application/x-netcdf"},
+            "jp2": {"href": "https://file.jp2"},
+        },
+    }
+    assets_reader = AssetsReader(item)
+    info = assets_reader._get_asset_info("cog")
+    assert info["env"]["GDAL_INGESTED_BYTES_AT_OPEN"] == 16384
+    assert info["env"]["VSI_CACHE"] == "TRUE"
+    # GDAL options are not used for the assets read with xarray
+    assert assets_reader._get_asset_info("data")["env"] == {}
+    assert (
+        assets_reader._get_asset_info("jp2")["env"]["GDAL_DISABLE_READDIR_ON_OPEN"]
+        == "EMPTY_DIR"
+    )
+
+
+def test_tile_exists(item_json):
+    """Test tile_exists with cached transformer."""
+    minx, miny, maxx, maxy = item_json["bbox"]
+    lon, lat = (minx + maxx) / 2, (miny + maxy) / 2
+
+    tms = morecantile.tms.get("WorldCRS84Quad")
+    for reader in [AssetsReader(item_json), AssetsReader(item_json, tms=tms)]:
+        for z in [12, 15]:
+            tile = reader.tms.tile(lon, lat, z)
+            assert reader.tile_exists(tile.x, tile.y, z)
+            assert not reader.tile_exists(tile.x + 10, tile.y + 10, z)
 
 
 def test_get_reader_any():
     """Test reader is rio_tiler.io.Reader"""
     asset_info = AssetInfo(url="https://file.tif")
-    empty_stac_reader = AssetsReader({"bbox": [], "assets": []})
+    empty_stac_reader = AssetsReader({"bbox": [], "assets": {}})
     assert empty_stac_reader._get_reader(asset_info) == Reader
 
 
@@ -41,22 +78,207 @@ def test_get_reader_any():
 def test_get_reader_netcdf():
     """Test reader attribute is titiler.stacapi.XarrayReader"""
     asset_info = AssetInfo(url="https://file.nc", type="application/netcdf")
-    empty_stac_reader = AssetsReader({"bbox": [], "assets": []})
+    empty_stac_reader = AssetsReader({"bbox": [], "assets": {}})
     empty_stac_reader._get_reader(asset_info)
 
 
-@pytest.mark.skip(reason="Too slow.")
+@pytest.mark.parametrize("tile", [(0, 0, 0), (8589, 12849, 15)])
 @patch("rio_tiler.io.rasterio.rasterio")
-def test_tile_cog(rio):
+def test_tile_cog(rio, tile, item_json):
     """Test tile function with COG asset."""
     rio.open = mock_rasterio_open
 
     with AssetsReader(item_json) as reader:
-        img = reader.tile(0, 0, 0, assets=["cog"])
+        img = reader.tile(*tile, assets=["cog"])
         assert isinstance(img, ImageData)
+        assert img.band_names == ["cog_b1", "cog_b2", "cog_b3"]
+
+        img = reader.tile(*tile, expression="cog_b1/cog_b2")
+        assert img.count == 1
+
+
+@pytest.mark.parametrize("asset_as_band", [True, False])
+@patch("rio_tiler.io.rasterio.rasterio")
+def test_tile_cog_asset_as_band(rio, asset_as_band, item_json):
+    """Test tile function with COG asset and asset_as_band option."""
+    rio.open = mock_rasterio_open
+
+    with AssetsReader(item_json) as reader:
+        img = reader.tile(
+            8589, 12849, 15, assets=["cog"], indexes=1, asset_as_band=asset_as_band
+        )
+        assert img.band_names == (["cog"] if asset_as_band else ["cog_b1"])
+
+        if asset_as_band:
+            with pytest.raises(AssetAsBandError):
+                reader.tile(8589, 12849, 15, assets=["cog"], asset_as_band=True)
+
+
+@pytest.mark.parametrize("threads", [1, 2])
+@patch("rio_tiler.io.rasterio.rasterio")
+def test_tile_cog_gdal_env_threads(rio, threads, item_json):
+    """Assets read from a non-main thread use their GDAL options."""
+    config = []
+
+    def _open(asset):
+        config.append(rasterio.env.get_gdal_config("GDAL_INGESTED_BYTES_AT_OPEN"))
+        return mock_rasterio_open(asset)
+
+    rio.open = _open
+
+    asset = {**item_json["assets"]["cog"], "file:header_size": 16384}
+    item = {**item_json, "assets": {"red": asset, "green": asset}}
+    with AssetsReader(item, threads=threads) as reader:
+        # Like in the application, call `tile` outside of the main thread where a
+        # rasterio.Env is not shared with the other threads
+        with futures.ThreadPoolExecutor(max_workers=1) as executor:
+            img = executor.submit(
+                reader.tile, 8589, 12849, 15, assets=["red", "green"], indexes=1
+            ).result()
+
+    assert img.band_names == ["red_b1", "green_b1"]
+    assert config == [16384, 16384]
 
 
 @pytest.mark.skip(reason="To be implemented.")
 def test_tile_netcdf():
     """Test tile function with netcdf asset."""
     pass
+
+
+def test_parse_expression(item_json):
+    """Test parse_expression."""
+    reader = AssetsReader(item_json)
+    assert reader.parse_expression("cog_b1/cog_b2") == ("cog",)
+    assert reader.parse_expression("cog*2", asset_as_band=True) == ("cog",)
+
+    with pytest.raises(InvalidExpression):
+        reader.parse_expression("cog*2")
+
+
+@patch("rio_tiler.io.rasterio.rasterio")
+def test_tile_cog_statistics(rio, item_json):
+    """Test tile function use the STAC raster:bands statistics."""
+    rio.open = mock_rasterio_open
+
+    stats = {"statistics": {"minimum": 0, "maximum": 255}}
+    item = {
+        **item_json,
+        "assets": {
+            "cog": {**item_json["assets"]["cog"], "raster:bands": [stats] * 3},
+        },
+    }
+    with AssetsReader(item) as reader:
+        img = reader.tile(8589, 12849, 15, assets=["cog"])
+        assert img.dataset_statistics == [(0, 255)] * 3
+        assert "cog" in img.metadata
+
+        img = reader.tile(8589, 12849, 15, assets=["cog"], indexes=1)
+        assert img.dataset_statistics == [(0, 255)]
+
+
+@patch("rio_tiler.io.rasterio.rasterio")
+def test_tile_unsupported_asset(rio, item_json):
+    """Unsupported assets should raise before any asset is opened."""
+    item = {
+        **item_json,
+        "assets": {
+            **item_json["assets"],
+            "data": {"href": "https://file.nc", "type": "application/x-netcdf"},
+        },
+    }
+    with AssetsReader(item) as reader:
+        with pytest.raises(NotImplementedError):
+            reader.tile(8589, 12849, 15, assets=["cog", "data"])
+
+    rio.open.assert_not_called()
+
+
+def test_dataset_statistics():
+    """Test _dataset_statistics."""
+    stats = {"statistics": {"minimum": 0, "maximum": 255}}
+    assert _dataset_statistics([stats, stats]) == [(0, 255), (0, 255)]
+    assert _dataset_statistics([stats, {}]) is None
+    assert _dataset_statistics([stats, {"statistics": {"minimum": 0}}]) is None
+    assert (
+        _dataset_statistics([stats, {"statistics": {"minimum": 0, "maximum": None}}])
+        is None
+    )
+
+
+@pytest.mark.parametrize(
+    "media_type",
+    ["application/vnd+zarr", "application/vnd.zarr", "application/x-netcdf"],
+)
+def test_get_reader_xarray_types(media_type):
+    """Multidimensional assets are not read with rio_tiler.io.Reader."""
+    asset_info = AssetInfo(url="https://file", type=media_type)
+    empty_stac_reader = AssetsReader({"bbox": [], "assets": {}})
+    with pytest.raises(NotImplementedError):
+        empty_stac_reader._get_reader(asset_info)
+
+
+def test_include_asset_types(item_json):
+    """Assets with unsupported media types are not listed."""
+    item = {
+        **item_json,
+        "assets": {
+            **item_json["assets"],
+            "thumbnail": {"href": "https://file.png", "type": "image/png"},
+            "metadata": {"href": "https://file.xml", "type": "application/xml"},
+            "untyped": {"href": "https://file.jp2"},
+        },
+    }
+    reader = AssetsReader(item)
+    assert reader.assets == ("cog", "untyped")
+    with pytest.raises(InvalidAssetName):
+        reader._get_asset_info("thumbnail")
+
+    reader = AssetsReader(item, include_asset_types={"image/png"})
+    assert reader.assets == ("thumbnail", "untyped")
+
+
+def test_get_asset_info_gdal_config(item_json, monkeypatch):
+    """Default GDAL options do not override the user's configuration."""
+    monkeypatch.setenv("GDAL_DISABLE_READDIR_ON_OPEN", "FALSE")
+
+    def _env():
+        reader = AssetsReader(item_json, env={"VSI_CACHE": "FALSE"})
+        return reader._get_asset_info("cog")["env"]
+
+    # Like in the application, get the asset info outside of the main thread
+    with futures.ThreadPoolExecutor(max_workers=1) as executor:
+        env = executor.submit(_env).result()
+
+    assert "GDAL_DISABLE_READDIR_ON_OPEN" not in env
+    assert env["VSI_CACHE"] == "FALSE"
+    assert env["GDAL_INGESTED_BYTES_AT_OPEN"] == 32768
+
+    # `file:header_size` takes precedence over the endpoint options
+    item = {
+        **item_json,
+        "assets": {"cog": {**item_json["assets"]["cog"], "file:header_size": 16384}},
+    }
+    reader = AssetsReader(item, env={"GDAL_INGESTED_BYTES_AT_OPEN": 65536})
+    assert reader._get_asset_info("cog")["env"]["GDAL_INGESTED_BYTES_AT_OPEN"] == 16384
+
+
+@pytest.mark.parametrize(
+    "media_type",
+    [
+        "application/vnd+zarr",
+        "application/vnd.zarr",
+        "application/x-netcdf",
+        "application/netcdf",
+    ],
+)
+def test_tile_xarray_types(media_type, item_json):
+    """Multidimensional assets are listed but cannot be read yet."""
+    item = {
+        **item_json,
+        "assets": {"data": {"href": "https://file", "type": media_type}},
+    }
+    with AssetsReader(item) as reader:
+        assert reader.assets == ("data",)
+        with pytest.raises(NotImplementedError):
+            reader.tile(8589, 12849, 15, assets=["data"])
@@ -1,28 +1,36 @@
 """test titiler-stacapi mosaic backend."""
 
-import json
-import os
+from concurrent import futures
 from unittest.mock import patch
 
+import morecantile
+import pyproj
+import pytest
+import rasterio
 from geojson_pydantic import Polygon
+from rasterio.crs import CRS
+from rasterio.warp import transform_bounds
+from rio_tiler.tasks import create_tasks
 
-from titiler.stacapi.backend import STACAPIBackend
+from titiler.stacapi.backend import (
+    STACAPIBackend,
+    _filter_items,
+    _search_cache_key,
+    _stac_api_io,
+    _tile_bounds,
+    sign_inplace,
+    sign_url,
+)
 
 from .conftest import mock_rasterio_open
 
-item_json = os.path.join(
-    os.path.dirname(__file__), "fixtures", "20200307aC0853900w361030.json"
-)
-
 
 @patch("rio_tiler.io.rasterio.rasterio")
 @patch("titiler.stacapi.backend.STACAPIBackend.get_assets")
-def test_stac_backend(get_assets, rio):
+def test_stac_backend(get_assets, rio, item_json):
     """test STACAPIBackend."""
     rio.open = mock_rasterio_open
-
-    with open(item_json, "r") as f:
-        get_assets.return_value = [json.loads(f.read())]
+    get_assets.return_value = [item_json]
 
     with STACAPIBackend("http://endpoint.stac") as stac:
         pass
@@ -30,7 +38,9 @@ def test_stac_backend(get_assets, rio):
     with STACAPIBackend("http://endpoint.stac") as stac:
         assets = stac.assets_for_tile(0, 0, 0)
         assert len(assets) == 1
-        assert isinstance(get_assets.call_args.args[0], Polygon)
+        assert get_assets.call_args.args[0] == pytest.approx(
+            (-180.0, -85.0511287798066, 180.0, 85.0511287798066)
+        )
         assert not get_assets.call_args.kwargs
 
     with STACAPIBackend("http://endpoint.stac") as stac:
@@ -42,9 +52,255 @@ def test_stac_backend(get_assets, rio):
             assets=["cog"],
         )
         assert assets[0]["id"] == "20200307aC0853900w361030"
-        assert isinstance(get_assets.call_args.args[0], Polygon)
+        assert isinstance(get_assets.call_args.args[0], tuple)
         assert get_assets.call_args.kwargs["search_query"] == {
             "collections": ["col"],
             "ids": ["20200307aC0853900w361030"],
         }
+        assert get_assets.call_args.kwargs["fields"] == [
+            "id",
+            "bbox",
+            "collection",
+            "assets.cog",
+        ]
         assert img.metadata["timings"]
+
+        # All the assets are requested when using an expression
+        img, _ = stac.tile(8589, 12849, 15, expression="cog_b1/cog_b2")
+        assert get_assets.call_args.kwargs["fields"] is None
+
+
+@patch("rio_tiler.io.rasterio.rasterio")
+@patch("titiler.stacapi.backend.STACAPIBackend.get_assets")
+def test_stac_backend_gdal_env(get_assets, rio, item_json):
+    """The endpoint GDAL options reach the threads reading the assets."""
+    config = []
+
+    def _open(asset):
+        config.append(rasterio.env.get_gdal_config("VSI_CACHE"))
+        return mock_rasterio_open(asset)
+
+    rio.open = _open
+    get_assets.return_value = [item_json]
+
+    def _tile():
+        env = {"VSI_CACHE": "FALSE"}
+        with rasterio.Env(**env):
+            with STACAPIBackend(
+                "http://endpoint.stac", reader_options={"env": env}
+            ) as stac:
+                return stac.tile(8589, 12849, 15, assets=["cog"], threads=4)
+
+    # Like in the application, call `tile` outside of the main thread
+    with futures.ThreadPoolExecutor(max_workers=1) as executor:
+        executor.submit(_tile).result()
+
+    assert config == ["FALSE"]
+
+
+@patch("titiler.stacapi.assets_reader.create_tasks", wraps=create_tasks)
+@patch("rio_tiler.io.rasterio.rasterio")
+@patch("titiler.stacapi.backend.STACAPIBackend.get_assets")
+def test_stac_backend_threads(get_assets, rio, tasks, item_json):
+    """Assets are read and merged the same way with or without threads."""
+    rio.open = mock_rasterio_open
+
+    asset = item_json["assets"]["cog"]
+    get_assets.return_value = [
+        {**item_json, "assets": {"red": asset, "green": asset, "blue": asset}}
+    ]
+
+    def _tile(threads):
+        with STACAPIBackend(
+            "http://endpoint.stac", reader_options={"threads": threads}
+        ) as stac:
+            img, _ = stac.tile(
+                8589, 12849, 15, assets=["red", "green", "blue"], indexes=1
+            )
+            return img
+
+    # Like in the application, call `tile` outside of the main thread
+    with futures.ThreadPoolExecutor(max_workers=1) as executor:
+        images = [executor.submit(_tile, threads).result() for threads in [1, 4]]
+
+    # No more threads than assets
+    assert [call.args[2] for call in tasks.call_args_list] == [1, 3]
+
+    for img in images:
+        assert img.band_names == ["red_b1", "green_b1", "blue_b1"]
+        assert (img.array[0] == img.array[1]).all()
+
+    assert (images[0].array == images[1].array).all()
+
+
+@patch("titiler.stacapi.backend.pc.sign_url")
+def test_sign_url_cache(pc_sign_url):
+    """Signed URLs are re-used until the SAS token expires."""
+    url = "https://account.blob.core.windows.net/container/cog.tif"
+
+    pc_sign_url.return_value = (
+        f"{url}?st=2020-01-01T00%3A00%3A00Z&se=2999-01-01T00%3A00%3A00Z&sp=rl"
+    )
+    page = {"features": [{"assets": {"cog": {"href": url}}}]}
+    sign_inplace(page)
+    assert page["features"][0]["assets"]["cog"]["href"] == pc_sign_url.return_value
+    assert sign_url(url) == pc_sign_url.return_value
+    assert pc_sign_url.call_count == 1
+    # signed URLs have their own cache, larger than the search results one
+    assert sign_url.cache.maxsize > STACAPIBackend.get_assets.cache.maxsize
+
+    # Expired tokens are not cached
+    url = "https://account.blob.core.windows.net/container/expired.tif"
+    pc_sign_url.return_value = (
+        f"{url}?st=2020-01-01T00%3A00%3A00Z&se=2020-01-02T00%3A00%3A00Z&sp=rl"
+    )
+    sign_url(url)
+    sign_url(url)
+    assert pc_sign_url.call_count == 3
+
+
+@patch("titiler.stacapi.backend.ItemSearch")
+def test_get_assets_compact(item_search, item_json):
+    """Only the asset keys used by the reader are kept in the cached items."""
+    asset = {
+        **item_json["assets"]["cog"],
+        "title": "COG",
+        "roles": ["data"],
+        "file:header_size": 16384,
+    }
+    item_search.return_value.items_as_dicts.return_value = iter(
+        [{**item_json, "assets": {"cog": asset}}]
+    )
+
+    with STACAPIBackend("http://compact.stac") as stac:
+        items = stac.get_assets(Polygon.from_bounds(*item_json["bbox"]), {})
+
+    assert items[0]["id"] == item_json["id"]
+    assert items[0]["assets"]["cog"] == {
+        "href": asset["href"],
+        "type": asset["type"],
+        "file:header_size": 16384,
+    }
+
+
+def test_tile_bounds():
+    """Tile bounds are computed once per TMS and tile index."""
+    tms = morecantile.tms.get("WebMercatorQuad")
+    bounds = _tile_bounds(tms, 8589, 12849, 15)
+    assert type(bounds) is tuple
+    assert bounds == tms.bounds(8589, 12849, 15)
+    assert _tile_bounds(tms, 8589, 12849, 15) is bounds
+
+    tms = morecantile.tms.get("WorldCRS84Quad")
+    assert _tile_bounds(tms, 8589, 12849, 15) != bounds
+
+    # Custom TMS re-using a registered identifier
+    tms = morecantile.TileMatrixSet.custom(
+        [-10, -10, 10, 10],
+        pyproj.CRS.from_epsg(4326),
+        id="WebMercatorQuad",
+    )
+    assert _tile_bounds(tms, 0, 0, 1) == pytest.approx((-10, 0, 0, 10))
+
+
+def test_search_cache_key():
+    """Search cache keys do not depend on the dictionaries order."""
+    stac = STACAPIBackend("http://endpoint.stac", headers={"a": "1", "b": "2"})
+    geom = Polygon.from_bounds(0, 0, 1, 1)
+
+    key = _search_cache_key(stac, geom, {"collections": ["col"], "limit": 10})
+    assert len(key) == 16
+    assert key == _search_cache_key(
+        STACAPIBackend("http://endpoint.stac", headers={"b": "2", "a": "1"}),
+        Polygon.from_bounds(0, 0, 1, 1),
+        {"limit": 10, "collections": ["col"]},
+    )
+    assert key != _search_cache_key(stac, geom, {"collections": ["col"]})
+    assert key != _search_cache_key(
+        stac, geom, {"collections": ["col"], "limit": 10}, fields=["id"]
+    )
+    assert _search_cache_key(stac, geom) == _search_cache_key(stac, geom, {})
+
+
+def test_filter_items():
+    """Items outside (or touching) the bounds are filtered out."""
+    items = [
+        {"id": "inside", "bbox": [0, 0, 2, 2]},
+        {"id": "outside", "bbox": [5, 5, 6, 6]},
+        {"id": "touching", "bbox": [1, -1, 2, 0]},
+        {"id": "3d", "bbox": [0.5, 0.5, 0, 0.6, 0.6, 10]},
+        {"id": "antimeridian", "bbox": [170, 0, -170, 1]},
+    ]
+    assert [item["id"] for item in _filter_items(items, (0, 0, 1, 1))] == [
+        "inside",
+        "3d",
+        "antimeridian",
+    ]
+    assert _filter_items([], (0, 0, 1, 1)) == []
+
+
+def test_stac_api_io():
+    """StacApiIO instances are shared between searches with the same headers."""
+    stac_io = _stac_api_io((("a", "1"),))
+    assert stac_io.session.headers["a"] == "1"
+    assert _stac_api_io((("a", "1"),)) is stac_io
+    assert _stac_api_io((("a", "2"),)) is not stac_io
+
+
+@patch("titiler.stacapi.backend.ItemSearch")
+def test_get_assets_search_params(item_search):
+    """Rectangles are searched with `bbox`, other geometries with `intersects`."""
+    item_search.return_value.items_as_dicts.return_value = iter([])
+
+    with STACAPIBackend("http://params.stac") as stac:
+        stac.assets_for_tile(0, 0, 1, search_query={"bbox": [0, 0, 1, 1]})
+        params = item_search.call_args.kwargs
+        assert params["bbox"] == pytest.approx([-180.0, 0.0, 0.0, 85.0511287798066])
+        assert "intersects" not in params
+
+        # Bounds are clamped to [-180, -90, 180, 90]
+        stac.assets_for_tile(0, 0, 0)
+        west, south, east, north = item_search.call_args.kwargs["bbox"]
+        assert west == -180.0 and east == 180.0
+        assert south == pytest.approx(-85.0511287798066)
+        assert north == pytest.approx(85.0511287798066)
+
+        tms = morecantile.tms.get("WorldCRS84Quad")
+        with STACAPIBackend("http://params.stac", tms=tms) as stac_wgs84:
+            stac_wgs84.assets_for_tile(524287, 0, 18)
+            assert item_search.call_args.kwargs["bbox"][2] == 180.0
+
+        stac.assets_for_bbox(-180.0001, -91, 180.0001, 91)
+        assert item_search.call_args.kwargs["bbox"] == [-180.0, -90.0, 180.0, 90.0]
+
+        geom = Polygon.from_bounds(0, 0, 1, 1)
+        stac.get_assets(geom, search_query={"bbox": [0, 0, 1, 1]})
+        params = item_search.call_args.kwargs
+        assert params["intersects"] == geom.model_dump_json(exclude_none=True)
+        assert "bbox" not in params
+
+        stac.assets_for_point(0.5, 0.5)
+        params = item_search.call_args.kwargs
+        assert params["intersects"] == {"type": "Point", "coordinates": [0.5, 0.5]}
+
+
+@patch("titiler.stacapi.backend.STACAPIBackend.get_assets")
+def test_assets_for_bbox_point(get_assets):
+    """Coordinates are transformed to WGS84 before searching."""
+    get_assets.return_value = []
+
+    with STACAPIBackend("http://endpoint.stac") as stac:
+        stac.assets_for_bbox(0, 0, 1, 1)
+        assert get_assets.call_args.args[0] == (0, 0, 1, 1)
+
+        stac.assets_for_bbox(0, 0, 1e6, 1e6, coord_crs=CRS.from_epsg(3857))
+        assert get_assets.call_args.args[0] == pytest.approx(
+            transform_bounds("epsg:3857", "epsg:4326", 0, 0, 1e6, 1e6)
+        )
+
+        stac.assets_for_point(1e6, 1e6, coord_crs=CRS.from_epsg(3857))
+        geom = get_assets.call_args.args[0]
+        assert geom["type"] == "Point"
+        assert geom["coordinates"] == pytest.approx(
+            [8.983152841195214, 8.946573850543412]
+        )
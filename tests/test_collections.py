@@ -1,24 +1,16 @@
 """Test titiler.stacapi Item endpoints."""
 
-import json
-import os
 from unittest.mock import patch
 
 from .conftest import mock_rasterio_open
 
-item_json = os.path.join(
-    os.path.dirname(__file__), "fixtures", "20200307aC0853900w361030.json"
-)
-
 
 @patch("titiler.stacapi.factory.STACAPIBackend.get_assets")
 @patch("rio_tiler.io.rasterio.rasterio")
-def test_stac_collections(rio, get_assets, app):
+def test_stac_collections(rio, get_assets, app, item_json):
     """test STAC items endpoints."""
     rio.open = mock_rasterio_open
-
-    with open(item_json, "r") as f:
-        get_assets.return_value = [json.loads(f.read())]
+    get_assets.return_value = [item_json]
 
     response = app.get(
         "/collections/noaa-emergency-response/tiles/WebMercatorQuad/15/8589/12849.png",
@@ -28,6 +20,20 @@ def test_stac_collections(rio, get_assets, app):
         },
     )
     assert response.status_code == 200
+    assert response.headers["content-type"] == "image/png"
+    etag = response.headers["etag"]
+
+    response = app.get(
+        "/collections/noaa-emergency-response/tiles/WebMercatorQuad/15/8589/12849.png",
+        params={
+            "assets": "cog",
+            "datetime": "2024-01-01",
+        },
+        headers={"If-None-Match": etag},
+    )
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+    assert not response.content
 
     response = app.get(
         "/collections/noaa-emergency-response/WebMercatorQuad/tilejson.json",
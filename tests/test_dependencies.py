@@ -101,3 +101,28 @@ def test_output_type():
         None,
     )
     assert dependencies.OutputType(req, f="json") == MediaType.json
+
+
+def test_stac_search_params():
+    """test STACSearchParams dependency."""
+    req = Request({"type": "http", "client": None, "query_string": "", "headers": ()})
+
+    query = dependencies.STACSearchParams(req, collection_id="col")
+    assert query["collections"] == ["col"]
+    assert query["max_items"] == 100
+    # items are fetched in one page by default
+    assert query["limit"] == 100
+
+    query = dependencies.STACSearchParams(req, collection_id="col", max_items=20)
+    assert query["limit"] == 20
+
+    # default page size is capped
+    query = dependencies.STACSearchParams(req, collection_id="col", max_items=5000)
+    assert query["limit"] == 1000
+    assert query["max_items"] == 5000
+
+    query = dependencies.STACSearchParams(
+        req, collection_id="col", limit=10, max_items=20
+    )
+    assert query["limit"] == 10
+    assert query["max_items"] == 20
@@ -1,12 +1,17 @@
 """titiler-stacapi Asset Reader."""
 
+import contextlib
+import functools
+import sys
+import types
 import warnings
-from typing import Any, Dict, Optional, Sequence, Set, Type, Union
+from typing import AbstractSet, Any, Dict, List, Optional, Sequence, Tuple, Type, Union
 
 import attr
+import numpy
 import rasterio
-from morecantile import TileMatrixSet
-from rio_tiler.constants import WEB_MERCATOR_TMS, WGS84_CRS
+from morecantile import Tile, TileMatrixSet
+from rio_tiler.constants import MAX_THREADS, WEB_MERCATOR_TMS, WGS84_CRS
 from rio_tiler.errors import (
     AssetAsBandError,
     ExpressionMixingWarning,
@@ -17,29 +22,64 @@ from rio_tiler.errors import (
 from rio_tiler.io import Reader
 from rio_tiler.io.base import BaseReader, MultiBaseReader
 from rio_tiler.models import ImageData
-from rio_tiler.tasks import multi_arrays
+from rio_tiler.tasks import create_tasks, filter_tasks
 from rio_tiler.types import Indexes
+from rio_tiler.utils import normalize_bounds
 
+from titiler.stacapi.constants import VALID_ASSET_TYPES as valid_types
+from titiler.stacapi.constants import XARRAY_ASSET_TYPES
 from titiler.stacapi.models import AssetInfo
 from titiler.stacapi.settings import STACSettings
+from titiler.stacapi.utils import to_wgs84_transformer
 
 stac_config = STACSettings()
 
-valid_types = {
-    "image/tiff; application=geotiff",
-    "image/tiff; application=geotiff; profile=cloud-optimized",
-    "image/tiff; profile=cloud-optimized; application=geotiff",
-    "image/vnd.stac.geotiff; cloud-optimized=true",
-    "image/tiff",
-    "image/x.geotiff",
-    "image/jp2",
-    "application/x-hdf5",
-    "application/x-hdf",
-    "application/vnd+zarr",
-    "application/x-netcdf",
+# Default GDAL options for the assets read with rasterio (through GDAL's /vsicurl/)
+# only used when not already set (e.g by environment variables)
+# - do not list the remote "directory" looking for sidecar files
+# - read the first 32KB of the file (usually the whole header) in one request
+# - merge consecutive range requests
+# - cache the fetched blocks in memory
+_GDAL_ENV = {
+    "GDAL_DISABLE_READDIR_ON_OPEN": "EMPTY_DIR",
+    "GDAL_INGESTED_BYTES_AT_OPEN": 32768,
+    "GDAL_HTTP_MERGE_CONSECUTIVE_RANGES": "YES",
+    "VSI_CACHE": "TRUE",
 }
 
 
+@functools.lru_cache(maxsize=256)
+def _parse_expression(
+    expression: str, asset_as_band: bool, assets: Tuple[str, ...]
+) -> Tuple[str, ...]:
+    """Return the assets used in a rio-tiler band math expression."""
+    return MultiBaseReader.parse_expression(
+        types.SimpleNamespace(assets=list(assets)),  # type: ignore
+        expression,
+        asset_as_band=asset_as_band,
+    )
+
+
+def _dataset_statistics(bands: Sequence[Dict]) -> Optional[List[Tuple[float, float]]]:
+    """Return the (min, max) of each band from STAC `raster:bands`.
+
+    Returns None when at least one band is missing its statistics.
+
+    """
+    stats: List[Tuple[float, float]] = []
+    append = stats.append
+    for band in bands:
+        band_stats = band.get("statistics") or {}
+        minimum = band_stats.get("minimum")
+        maximum = band_stats.get("maximum")
+        if minimum is None or maximum is None:
+            return None
+
+        append((minimum, maximum))
+
+    return stats
+
+
 @attr.s
 class AssetsReader(MultiBaseReader):
     """
@@ -57,7 +97,13 @@ class AssetsReader(MultiBaseReader):
 
     ctx: Any = attr.ib(default=rasterio.Env)
 
-    include_asset_types: Set[str] = attr.ib(default=valid_types)
+    # GDAL options set by the endpoint (e.g from the `environment_dependency`)
+    env: Dict = attr.ib(factory=dict)
+
+    include_asset_types: AbstractSet[str] = attr.ib(default=valid_types)
+
+    # Maximum number of threads used to read the assets concurrently
+    threads: int = attr.ib(default=MAX_THREADS)
 
     @minzoom.default
     def _minzoom(self):
@@ -74,19 +120,53 @@ class AssetsReader(MultiBaseReader):
         # MultibaseReader includes the spatial mixin so these attributes are required to assert that the tile exists inside the bounds of the item
         self.crs = WGS84_CRS  # Per specification STAC items are in WGS84
         self.bounds = self.input["bbox"]
-        self.assets = list(self.input["assets"])
+        # Skip the assets we cannot read (e.g thumbnails or metadata files)
+        self.assets = tuple(
+            sys.intern(name)
+            for name, asset in self.input["assets"].items()
+            if asset.get("type") is None or asset["type"] in self.include_asset_types
+        )
+        self._asset_set = frozenset(self.assets)
+        self._asset_info_cache: Dict[str, AssetInfo] = {}
+
+    def tile_exists(self, tile_x: int, tile_y: int, tile_z: int) -> bool:
+        """Check if a tile intersects the item's bounds.
+
+        Same as rio-tiler's implementation but uses a cached pyproj Transformer
+        instead of creating a new GDAL transformation on each call.
+
+        """
+        transformer = to_wgs84_transformer(self.tms.crs.srs)
+        tile_bounds = transformer.transform_bounds(
+            *self.tms.xy_bounds(Tile(x=tile_x, y=tile_y, z=tile_z)),
+            densify_pts=21,
+        )
+
+        # If tile_bounds has non-finite value in WGS84 we return True
+        if not all(numpy.isfinite(tile_bounds)):
+            return True
+
+        tile_bounds = normalize_bounds(tile_bounds)
+        dst_bounds = normalize_bounds(self.bounds)
+
+        return (
+            (tile_bounds[0] < dst_bounds[2])
+            and (tile_bounds[2] > dst_bounds[0])
+            and (tile_bounds[3] > dst_bounds[1])
+            and (tile_bounds[1] < dst_bounds[3])
+        )
+
+    def parse_expression(self, expression: str, asset_as_band: bool = False) -> Tuple:
+        """Parse rio-tiler band math expression.
+
+        Results are cached because the same expression is parsed for every tile.
+
+        """
+        return _parse_expression(expression, asset_as_band, self.assets)
 
     def _get_reader(self, asset_info: AssetInfo) -> Type[BaseReader]:
         """Get Asset Reader."""
-        asset_type = asset_info.get("type", None)
-
-        if asset_type and asset_type in [
-            "application/x-hdf5",
-            "application/x-hdf",
-            "application/vnd.zarr",
-            "application/x-netcdf",
-            "application/netcdf",
-        ]:
+        if asset_info.get("type") in XARRAY_ASSET_TYPES:
             raise NotImplementedError("XarrayReader not yet implemented")
 
         return Reader
@@ -102,7 +182,10 @@ class AssetsReader(MultiBaseReader):
             AssetInfo: Asset info
 
         """
-        if asset not in self.assets:
+        if asset in self._asset_info_cache:
+            return self._asset_info_cache[asset]
+
+        if asset not in self._asset_set:
             raise InvalidAssetName(
                 f"{asset} is not valid. Should be one of {self.assets}"
             )
@@ -113,25 +196,34 @@ class AssetsReader(MultiBaseReader):
         if alternate := stac_config.alternate_url:
             url = asset_info["alternate"][alternate]["href"]
 
-        info = AssetInfo(url=url, env={})
+        env: Dict = {}
+        if asset_info.get("type") not in XARRAY_ASSET_TYPES:
+            env.update(
+                {
+                    key: value
+                    for key, value in _GDAL_ENV.items()
+                    if rasterio.env.get_gdal_config(key) is None
+                }
+            )
 
-        if asset_info.get("type"):
-            info["type"] = asset_info["type"]
+        # the endpoint's rasterio.Env is not active in the threads reading the assets
+        env.update(self.env)
 
         # there is a file STAC extension for which `header_size` is the size of the header in the file
         # if this value is present, we want to use the GDAL_INGESTED_BYTES_AT_OPEN env variable to read that many bytes at file open.
         if header_size := asset_info.get("file:header_size"):
-            info["env"]["GDAL_INGESTED_BYTES_AT_OPEN"] = header_size  # type: ignore
+            env["GDAL_INGESTED_BYTES_AT_OPEN"] = header_size
+
+        info = AssetInfo(url=url, env=env)
+
+        if asset_info.get("type"):
+            info["type"] = asset_info["type"]
 
         if bands := asset_info.get("raster:bands"):
-            stats = [
-                (b["statistics"]["minimum"], b["statistics"]["maximum"])
-                for b in bands
-                if {"minimum", "maximum"}.issubset(b.get("statistics", {}))
-            ]
-            if len(stats) == len(bands):
+            if stats := _dataset_statistics(bands):
                 info["dataset_statistics"] = stats
 
+        self._asset_info_cache[asset] = info
         return info
 
     def tile(  # noqa: C901
@@ -190,31 +282,80 @@ class AssetsReader(MultiBaseReader):
         # We fall back to `indexes` if provided
         indexes = kwargs.pop("indexes", None)
 
+        # Resolve the readers first so unsupported assets fail before any I/O
+        readers = {
+            asset: self._get_reader(self._get_asset_info(asset)) for asset in assets
+        }
+
+        # No need for a ThreadPool when reading a single asset
+        threads = min(self.threads, len(assets))
+
+        # When the assets are read sequentially in this thread and share the same
+        # GDAL options (e.g same media type) we enter one GDAL environment for the
+        # whole tile instead of one per asset. A rasterio.Env is thread-local, so
+        # the reading threads of a ThreadPool each enter their own.
+        envs = [self._get_asset_info(asset).get("env") or {} for asset in assets]
+        shared_env = (
+            envs[0] if threads <= 1 and all(env == envs[0] for env in envs) else None
+        )
+
         def _reader(asset: str, *args: Any, **kwargs: Any) -> ImageData:
             idx = asset_indexes.get(asset) or indexes  # type: ignore
             asset_info = self._get_asset_info(asset)
-            reader = self._get_reader(asset_info)
+            reader = readers[asset]
 
-            with self.ctx(**asset_info.get("env", {})):
+            ctx = (
+                self.ctx(**asset_info.get("env", {}))
+                if shared_env is None
+                else contextlib.nullcontext()
+            )
+            with ctx:
                 with reader(
                     asset_info["url"], tms=self.tms, **self.reader_options
                 ) as src:
                     if idx is not None:
                         kwargs.update({"indexes": idx})
-                    data = src.tile(*args, **kwargs)
+                    return src.tile(*args, **kwargs)
+
+        ctx = (
+            self.ctx(**shared_env)
+            if shared_env is not None
+            else contextlib.nullcontext()
+        )
+        with ctx:
+            tasks = create_tasks(
+                _reader, assets, threads, tile_x, tile_y, tile_z, **kwargs
+            )
+            results = list(filter_tasks(tasks))
+
+        # Update the ImageData outside of the reading threads
+        images = []
+        for data, asset in results:
+            asset_info = self._get_asset_info(asset)
+
+            self._update_statistics(
+                data,
+                indexes=asset_indexes.get(asset) or indexes,
+                statistics=asset_info.get("dataset_statistics"),
+            )
+
+            metadata = data.metadata or {}
+            if m := asset_info.get("metadata"):
+                metadata.update(m)
+            data.metadata = {asset: metadata}
 
-                    if asset_as_band:
-                        if len(data.band_names) > 1:
-                            raise AssetAsBandError(
-                                "Can't use `asset_as_band` for multibands asset"
-                            )
-                        data.band_names = [asset]
-                    else:
-                        data.band_names = [f"{asset}_{n}" for n in data.band_names]
+            if asset_as_band:
+                if len(data.band_names) > 1:
+                    raise AssetAsBandError(
+                        "Can't use `asset_as_band` for multibands asset"
+                    )
+                data.band_names = [asset]
+            else:
+                data.band_names = [f"{asset}_{n}" for n in data.band_names]
 
-                    return data
+            images.append(data)
 
-        img = multi_arrays(assets, _reader, tile_x, tile_y, tile_z, **kwargs)
+        img = ImageData.create_from_list(images)
         if expression:
             return img.apply_expression(expression)
 
@@ -1,22 +1,26 @@
 """titiler-stacapi custom Mosaic Backend and Custom STACReader."""
 
-import json
-from typing import Any, Dict, List, Optional, Tuple, Type
+import functools
+import hashlib
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple, Type, Union
+from urllib.parse import parse_qs, urlparse
 
 import attr
+import numpy
+import orjson
 import planetary_computer as pc
-from cachetools import TTLCache, cached
-from cachetools.keys import hashkey
+from cachetools import LRUCache, TLRUCache, TTLCache, cached
 from cogeo_mosaic.backends import BaseBackend
 from cogeo_mosaic.errors import NoAssetFoundError
 from cogeo_mosaic.mosaic import MosaicJSON
-from geojson_pydantic import Point, Polygon
 from geojson_pydantic.geometries import Geometry
 from morecantile import Tile, TileMatrixSet
 from pystac_client import ItemSearch
 from pystac_client.stac_api_io import StacApiIO
 from rasterio.crs import CRS
-from rasterio.warp import transform, transform_bounds
 from rio_tiler.constants import WEB_MERCATOR_TMS, WGS84_CRS
 from rio_tiler.models import ImageData
 from rio_tiler.mosaic import mosaic_reader
@@ -25,12 +29,141 @@ from urllib3 import Retry
 
 from titiler.stacapi.assets_reader import AssetsReader
 from titiler.stacapi.settings import CacheSettings, RetrySettings, STACSettings
-from titiler.stacapi.utils import Timer
+from titiler.stacapi.utils import Timer, to_wgs84_transformer
 
 cache_config = CacheSettings()
 retry_config = RetrySettings()
 stac_config = STACSettings()
 
+# Asset keys used by the AssetsReader, others are dropped before caching the items
+_ASSET_KEYS = frozenset(
+    {"href", "type", "alternate", "file:header_size", "raster:bands"}
+)
+
+
+# Tile bounds, keyed by TMS instance (not its identifier, which custom TMS may reuse)
+# The cached values hold a reference to the TMS so its `id()` cannot be re-used
+_tile_bounds_cache: LRUCache = LRUCache(maxsize=65536)
+_tile_bounds_lock = threading.Lock()
+
+
+def _clamp_bbox(west: float, south: float, east: float, north: float) -> BBox:
+    """Clamp a bbox to the WGS84 bounds (STAC APIs reject longitudes > 180)."""
+    return (max(west, -180.0), max(south, -90.0), min(east, 180.0), min(north, 90.0))
+
+
+def _tile_bounds(tms: TileMatrixSet, x: int, y: int, z: int) -> BBox:
+    """Return the geographic bounds of a tile."""
+    key = (id(tms), x, y, z)
+    with _tile_bounds_lock:
+        if (cached_value := _tile_bounds_cache.get(key)) is not None:
+            return cached_value[1]
+
+    # tms.bounds has float errors at the antimeridian (e.g 180.00000000000009)
+    b = tms.bounds(Tile(x, y, z))
+    bounds = _clamp_bbox(b.left, b.bottom, b.right, b.top)
+    with _tile_bounds_lock:
+        _tile_bounds_cache[key] = (tms, bounds)
+
+    return bounds
+
+
+def _search_cache_key(
+    backend: "STACAPIBackend",
+    geom: Union[Geometry, Dict, BBox],
+    search_query: Optional[Dict] = None,
+    fields: Optional[List[str]] = None,
+) -> bytes:
+    """Return a digest of the STAC search inputs."""
+    return hashlib.blake2b(
+        orjson.dumps(
+            (
+                backend.url,
+                (geom if isinstance(geom, (tuple, dict)) else geom.__geo_interface__),
+                search_query or {},
+                backend.headers,
+                fields,
+            ),
+            option=orjson.OPT_SORT_KEYS,
+        ),
+        digest_size=16,
+    ).digest()
+
+
+def _filter_items(items: List[Dict], bounds: BBox) -> List[Dict]:
+    """Return the items which bbox intersects the bounds (in WGS84)."""
+    if not items:
+        return items
+
+    # support 3D bbox, e.g [minx, miny, minz, maxx, maxy, maxz]
+    bboxes = numpy.array(
+        [
+            (b[0], b[1], b[len(b) // 2], b[len(b) // 2 + 1])
+            for b in (item["bbox"] for item in items)
+        ],
+        dtype=numpy.float64,
+    )
+    west, south, east, north = bounds
+    mask = (
+        (bboxes[:, 0] < east)
+        & (bboxes[:, 2] > west)
+        & (bboxes[:, 1] < north)
+        & (bboxes[:, 3] > south)
+    )
+    # keep items crossing the antimeridian
+    mask |= bboxes[:, 0] > bboxes[:, 2]
+
+    return [item for item, m in zip(items, mask) if m]
+
+
+@functools.lru_cache(maxsize=32)
+def _stac_api_io(headers: Tuple[Tuple[str, str], ...]) -> StacApiIO:
+    """Return a StacApiIO, shared between searches using the same headers.
+
+    Re-using the requests Session keeps the connections to the STAC API alive.
+
+    """
+    return StacApiIO(
+        max_retries=Retry(
+            total=retry_config.retry,
+            backoff_factor=retry_config.retry_factor,
+        ),
+        headers=dict(headers),
+    )
+
+
+def _sas_expiry(key: Any, url: str, now: float) -> float:
+    """Return the time at which a signed URL should be evicted from the cache."""
+    if se := parse_qs(urlparse(url).query).get("se"):
+        try:
+            expiry = datetime.strptime(se[0], "%Y-%m-%dT%H:%M:%SZ")
+        except ValueError:
+            return now
+
+        # Keep a one minute buffer, like planetary_computer does for its tokens
+        return expiry.replace(tzinfo=timezone.utc).timestamp() - 60
+
+    # URL was not signed (e.g not hosted on Azure Blob Storage)
+    return now + cache_config.ttl
+
+
+@cached(  # type: ignore
+    TLRUCache(
+        maxsize=cache_config.signed_url_maxsize, ttu=_sas_expiry, timer=time.time
+    ),
+    lock=threading.Lock(),
+)
+def sign_url(url: str) -> str:
+    """Sign URL with Planetary Computer SAS token."""
+    return pc.sign_url(url)
+
+
+def sign_inplace(page: Any) -> None:
+    """Sign STAC Items assets href in a STAC API search page."""
+    for item in page.get("features", []):
+        for asset in item.get("assets", {}).values():
+            asset["href"] = sign_url(asset["href"])
+
 
 @attr.s
 class STACAPIBackend(BaseBackend):
@@ -98,8 +231,7 @@ class STACAPIBackend(BaseBackend):
 
     def assets_for_tile(self, x: int, y: int, z: int, **kwargs: Any) -> List[Dict]:
         """Retrieve assets for tile."""
-        bbox = self.tms.bounds(Tile(x, y, z))
-        return self.get_assets(Polygon.from_bounds(*bbox), **kwargs)
+        return self.get_assets(_tile_bounds(self.tms, x, y, z), **kwargs)
 
     def assets_for_point(
         self,
@@ -110,10 +242,9 @@ class STACAPIBackend(BaseBackend):
     ) -> List[Dict]:
         """Retrieve assets for point."""
         if coord_crs != WGS84_CRS:
-            xs, ys = transform(coord_crs, WGS84_CRS, [lng], [lat])
-            lng, lat = xs[0], ys[0]
+            lng, lat = to_wgs84_transformer(coord_crs).transform(lng, lat)
 
-        return self.get_assets(Point(type="Point", coordinates=(lng, lat)), **kwargs)
+        return self.get_assets({"type": "Point", "coordinates": [lng, lat]}, **kwargs)
 
     def assets_for_bbox(
         self,
@@ -126,59 +257,56 @@ class STACAPIBackend(BaseBackend):
     ) -> List[Dict]:
         """Retrieve assets for bbox."""
         if coord_crs != WGS84_CRS:
-            xmin, ymin, xmax, ymax = transform_bounds(
-                coord_crs,
-                WGS84_CRS,
-                xmin,
-                ymin,
-                xmax,
-                ymax,
+            xmin, ymin, xmax, ymax = to_wgs84_transformer(coord_crs).transform_bounds(
+                xmin, ymin, xmax, ymax, densify_pts=21
             )
 
-        return self.get_assets(Polygon.from_bounds(xmin, ymin, xmax, ymax), **kwargs)
+        return self.get_assets(_clamp_bbox(xmin, ymin, xmax, ymax), **kwargs)
 
     @cached(  # type: ignore
         TTLCache(maxsize=cache_config.maxsize, ttl=cache_config.ttl),
-        key=lambda self, geom, search_query, **kwargs: hashkey(
-            self.url,
-            str(geom),
-            json.dumps(search_query),
-            json.dumps(self.headers),
-            **kwargs,
-        ),
+        key=_search_cache_key,
     )
     def get_assets(
         self,
-        geom: Geometry,
+        geom: Union[Geometry, Dict, BBox],
         search_query: Optional[Dict] = None,
         fields: Optional[List[str]] = None,
     ) -> List[Dict]:
-        """Find assets."""
+        """Find assets intersecting a geometry (GeoJSON) or a bounding box (in WGS84)."""
         search_query = search_query or {}
         fields = fields or ["assets", "id", "bbox", "collection"]
 
-        stac_api_io = StacApiIO(
-            max_retries=Retry(
-                total=retry_config.retry,
-                backoff_factor=retry_config.retry_factor,
-            ),
-            headers=self.headers,
-        )
-
-        params = {
-            **search_query,
-            "intersects": geom.model_dump_json(exclude_none=True),
-            "fields": fields,
-        }
-        params.pop("bbox", None)
+        stac_api_io = _stac_api_io(tuple(sorted(self.headers.items())))
+
+        params = {**search_query, "fields": fields}
+        # Use a simple `bbox` filter for rectangles (e.g tiles)
+        if isinstance(geom, tuple):
+            params["bbox"] = list(geom)
+        else:
+            params.pop("bbox", None)
+            params["intersects"] = (
+                geom
+                if isinstance(geom, dict)
+                else geom.model_dump_json(exclude_none=True)
+            )
 
         results = ItemSearch(
             f"{self.url}/search",
             stac_io=stac_api_io,
             **params,
-            modifier=pc.sign_inplace,
+            modifier=sign_inplace,
         )
-        return list(results.items_as_dicts())
+
+        items = []
+        for item in results.items_as_dicts():
+            item["assets"] = {
+                name: {k: v for k, v in asset.items() if k in _ASSET_KEYS}
+                for name, asset in item.get("assets", {}).items()
+            }
+            items.append(item)
+
+        return items
 
     @property
     def _quadkeys(self) -> List[str]:
@@ -195,16 +323,31 @@ class STACAPIBackend(BaseBackend):
         """Get Tile from multiple observation."""
         timings = []
 
+        # Only request the assets we are going to read
+        # (not possible with expression, which may reference any asset)
+        fields = None
+        if (assets := kwargs.get("assets")) and not kwargs.get("expression"):
+            if isinstance(assets, str):
+                assets = (assets,)
+
+            fields = ["id", "bbox", "collection", *(f"assets.{a}" for a in assets)]
+
         with Timer() as t:
             mosaic_assets = self.assets_for_tile(
                 tile_x,
                 tile_y,
                 tile_z,
                 search_query=search_query,
+                fields=fields,
             )
 
         timings.append(("search", round(t.elapsed * 1000, 2)))
 
+        # Do not open the items which only touch the tile
+        mosaic_assets = _filter_items(
+            mosaic_assets, _tile_bounds(self.tms, tile_x, tile_y, tile_z)
+        )
+
         if not mosaic_assets:
             raise NoAssetFoundError(
                 f"No assets found for tile {tile_z}-{tile_x}-{tile_y}"
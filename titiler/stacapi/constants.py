@@ -0,0 +1,31 @@
+"""titiler-stacapi constants."""
+
+from typing import FrozenSet
+
+# Asset media types which will need a XarrayReader
+XARRAY_ASSET_TYPES: FrozenSet[str] = frozenset(
+    {
+        "application/x-hdf5",
+        "application/x-hdf",
+        "application/vnd+zarr",
+        "application/vnd.zarr",
+        "application/x-netcdf",
+        "application/netcdf",
+    }
+)
+
+# Asset media types supported by the readers
+VALID_ASSET_TYPES: FrozenSet[str] = (
+    frozenset(
+        {
+            "image/tiff; application=geotiff",
+            "image/tiff; application=geotiff; profile=cloud-optimized",
+            "image/tiff; profile=cloud-optimized; application=geotiff",
+            "image/vnd.stac.geotiff; cloud-optimized=true",
+            "image/tiff",
+            "image/x.geotiff",
+            "image/jp2",
+        }
+    )
+    | XARRAY_ASSET_TYPES
+)
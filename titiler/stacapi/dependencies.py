@@ -125,7 +125,9 @@ def STACSearchParams(
     # ] = None,
     limit: Annotated[
         Optional[int],
-        Query(description="Limit the number of items per page search (default: 10)"),
+        Query(
+            description="Limit the number of items per page search (default: same as `max_items`, up to 1000)"
+        ),
     ] = None,
     max_items: Annotated[
         Optional[int],
@@ -133,6 +135,8 @@ def STACSearchParams(
     ] = None,
 ) -> Dict:
     """Dependency to construct STAC API Search Query."""
+    max_items = max_items or 100
+
     return {
         "collections": [collection_id],
         "ids": ids.split(",") if ids else None,
@@ -141,6 +145,8 @@ def STACSearchParams(
         # "sortby": sortby,
         # "filter": query,
         # "filter-lang": filter_lang,
-        "limit": limit or 10,
-        "max_items": max_items or 100,
+        # Pages are fetched sequentially (next links are opaque), so by default
+        # we request all the items in one page (within common STAC API page limits).
+        "limit": limit or min(max_items, 1000),
+        "max_items": max_items,
     }
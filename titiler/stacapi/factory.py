@@ -1,5 +1,6 @@
 """Custom MosaicTiler Factory for TiTiler-STACAPI Mosaic Backend."""
 
+import hashlib
 import os
 from dataclasses import dataclass
 from typing import Any, Callable, Dict, Literal, Optional, Type
@@ -200,7 +201,7 @@ class MosaicTilerFactory(BaseTilerFactory):
                     url=api_params["api_url"],
                     headers=api_params.get("headers", {}),
                     tms=tms,
-                    reader_options={**reader_params},
+                    reader_options={**reader_params, "env": env},
                     **backend_params,
                 ) as src_dst:
                     if MOSAIC_STRICT_ZOOM and (
@@ -253,6 +254,14 @@ class MosaicTilerFactory(BaseTilerFactory):
                     [f"{name};dur={time}" for (name, time) in image.metadata["timings"]]
                 )
 
+            # Let clients revalidate cached tiles without downloading them again
+            etag = f'"{hashlib.blake2b(content, digest_size=8).hexdigest()}"'
+            headers["ETag"] = etag
+            if if_none_match := request.headers.get("if-none-match"):
+                tags = [tag.strip() for tag in if_none_match.split(",")]
+                if etag in tags or f"W/{etag}" in tags or "*" in tags:
+                    return Response(status_code=304, headers=headers)
+
             return Response(content, media_type=media_type, headers=headers)
 
     def register_tilejson(self) -> None:
@@ -38,6 +38,10 @@ class CacheSettings(BaseSettings):
     # Maximum size of the cache in Number of element
     maxsize: int = 512
 
+    # Maximum number of signed asset URLs to keep in cache
+    # (one search page can sign every asset of `max_items` items)
+    signed_url_maxsize: int = 16384
+
     # Whether or not caching is enabled
     disable: bool = False
 
@@ -53,6 +57,7 @@ class CacheSettings(BaseSettings):
         if self.disable:
             self.ttl = 0
             self.maxsize = 0
+            self.signed_url_maxsize = 0
 
         return self
 
@@ -4,15 +4,23 @@ Code from titiler.pgstac and titiler.cmr, MIT License.
 
 """
 
+import functools
 import re
 import time
 from typing import Any, List, Optional
 
 from morecantile import TileMatrixSet
+from pyproj import Transformer
 from starlette.requests import Request
 from starlette.templating import Jinja2Templates, _TemplateResponse
 
 
+@functools.lru_cache(maxsize=64)
+def to_wgs84_transformer(crs: Any) -> Transformer:
+    """Return a pyproj Transformer from `crs` to WGS84."""
+    return Transformer.from_crs(crs, "EPSG:4326", always_xy=True)
+
+
 def create_html_response(
     request: Request,
     data: Any,